@@ -5,6 +5,35 @@ Parse VLM outputs to extract numerical answers
 import re
 from typing import Dict, Optional
 
+# A unit never runs into another labelled answer, so a loose "number + unit"
+# match cannot swallow an "Answer:" / "Reading:" label that follows it
+_LABEL = r'(?:answer:|(?:final\s+)?reading:)\s*[0-9.]|(?:approximately|around|about)\s+[0-9.]'
+_UNIT = rf'(?:(?!{_LABEL})[a-zA-Z°/%])+'
+
+# All four patterns fused into one alternation so the text is scanned once.
+# Compiled once at import instead of on every parse_answer call.
+_COMBINED_PATTERN = re.compile(
+    # Pattern 1: "Answer: 4.4 A" or "Answer: 66 ml"
+    rf'(?P<answer>Answer:\s*(?P<answer_value>[0-9.]+)\s*(?P<answer_unit>{_UNIT}))'
+    # Pattern 2: "Final reading: 65 ml" or "Reading: 4.4 A"
+    rf'|(?P<reading>(?:Final\s+)?Reading:\s*(?P<reading_value>[0-9.]+)\s*(?P<reading_unit>{_UNIT}))'
+    # Pattern 3: "approximately X unit" or "around X unit"
+    rf'|(?P<approx>(?:approximately|around|about)\s+(?P<approx_value>[0-9.]+)\s*(?P<approx_unit>{_UNIT}))'
+    # Pattern 4: any number + unit combination. The lookbehind starts a
+    # number only at the beginning of a digit run, so a long run without a
+    # unit is rejected once instead of being retried from every digit.
+    rf'|(?P<generic>(?<![0-9.])(?P<generic_value>[0-9.]+)\s*(?P<generic_unit>{_UNIT}))',
+    re.IGNORECASE
+)
+
+# The closing "Answer:" line of a long response is looked up in its last
+# _TAIL_CHARS characters before falling back to a scan of the whole text
+_TAIL_CHARS = 500
+_ANSWER_PATTERN = re.compile(
+    rf'Answer:\s*(?P<answer_value>[0-9.]+)\s*(?P<answer_unit>{_UNIT})',
+    re.IGNORECASE
+)
+
 
 class AnswerParser:
     """Extract structured answer from VLM text output"""
@@ -14,9 +43,11 @@ class AnswerParser:
         """
         Extract numerical value and unit from VLM response
         
+        Priority: "Answer:" > "Reading:" > "approximately X" > last number + unit
+        
         Args:
             text: VLM output text
-            
+
         Returns:
             {
                 "value": float or None,
@@ -25,47 +56,31 @@ class AnswerParser:
             }
         """
         
-        # Pattern 1: "Answer: 4.4 A" or "Answer: 66 ml"
-        pattern1 = r'Answer:\s*([0-9.]+)\s*([a-zA-Z°/%]+)'
-        match = re.search(pattern1, text, re.IGNORECASE)
-        if match:
-            return {
-                "value": float(match.group(1)),
-                "unit": match.group(2),
-                "raw_answer": f"{match.group(1)} {match.group(2)}"
-            }
+        if len(text) > _TAIL_CHARS:
+            match = _ANSWER_PATTERN.search(text, len(text) - _TAIL_CHARS)
+            if match:
+                return AnswerParser._to_result(match, "answer")
         
-        # Pattern 2: "Final reading: 65 ml" or "Reading: 4.4 A"
-        pattern2 = r'(?:Final\s+)?Reading:\s*([0-9.]+)\s*([a-zA-Z°/%]+)'
-        match = re.search(pattern2, text, re.IGNORECASE)
-        if match:
-            return {
-                "value": float(match.group(1)),
-                "unit": match.group(2),
-                "raw_answer": f"{match.group(1)} {match.group(2)}"
-            }
+        reading = None
+        approx = None
+        generic = None
         
-        # Pattern 3: "approximately X unit" or "around X unit"
-        pattern3 = r'(?:approximately|around|about)\s+([0-9.]+)\s*([a-zA-Z°/%]+)'
-        match = re.search(pattern3, text, re.IGNORECASE)
-        if match:
-            return {
-                "value": float(match.group(1)),
-                "unit": match.group(2),
-                "raw_answer": f"{match.group(1)} {match.group(2)}"
-            }
+        for match in _COMBINED_PATTERN.finditer(text):
+            kind = match.lastgroup
+            if kind == "answer":
+                # Highest priority, nothing later can beat it
+                return AnswerParser._to_result(match, kind)
+            if kind == "reading":
+                reading = reading or match
+            elif kind == "approx":
+                approx = approx or match
+            else:
+                # Keep the last occurrence (usually the final answer)
+                generic = match
         
-        # Pattern 4: Just find last number + unit combination
-        pattern4 = r'([0-9.]+)\s*([a-zA-Z°/%]+)'
-        matches = re.findall(pattern4, text)
-        if matches:
-            # Take the last occurrence (usually the final answer)
-            last = matches[-1]
-            return {
-                "value": float(last[0]),
-                "unit": last[1],
-                "raw_answer": f"{last[0]} {last[1]}"
-            }
+        for kind, match in (("reading", reading), ("approx", approx), ("generic", generic)):
+            if match:
+                return AnswerParser._to_result(match, kind)
         
         # No match found
         return {
@@ -74,6 +89,17 @@ class AnswerParser:
             "raw_answer": None
         }
     
+    @staticmethod
+    def _to_result(match: re.Match, kind: str) -> Dict[str, any]:
+        """Build the parse result from a match of the given pattern kind"""
+        value = match.group(f"{kind}_value")
+        unit = match.group(f"{kind}_unit")
+        return {
+            "value": float(value),
+            "unit": unit,
+            "raw_answer": f"{value} {unit}"
+        }
+    
     @staticmethod
     def format_answer(value: float, unit: str) -> str:
         """Format value and unit as string"""
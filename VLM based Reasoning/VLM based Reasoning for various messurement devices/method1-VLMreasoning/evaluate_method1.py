@@ -2,9 +2,16 @@
 Evaluate Method 1 predictions against ground truth
 """
 
-import json
 import argparse
-from typing import Dict, List
+from types import MappingProxyType
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from json_io import load_json, dump_json
+
+# Shared read-only stand-in for a missing ground truth, so no dict is built per row
+_EMPTY_GROUND_TRUTH = MappingProxyType({})
 
 
 class Method1Evaluator:
@@ -26,7 +33,10 @@ class Method1Evaluator:
             return False
         
         min_val, max_val = ground_truth_interval
-        return min_val <= predicted <= max_val
+        if min_val is None or max_val is None:
+            return False
+        # Bounds may be stored as strings in the dataset JSON
+        return float(min_val) <= predicted <= float(max_val)
     
     @staticmethod
     def is_unit_correct(predicted: str, ground_truth: str) -> bool:
@@ -40,6 +50,38 @@ class Method1Evaluator:
         
         return pred_unit == gt_unit
     
+    @staticmethod
+    def evaluate_batch(predicted_values: Sequence[Optional[float]],
+                       ground_truth_intervals: Sequence[Optional[List[float]]],
+                       predicted_units: Sequence[Optional[str]],
+                       ground_truth_units: Sequence[Optional[str]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorized is_value_correct / is_unit_correct over many predictions
+        
+        Args:
+            predicted_values: Predicted numerical values (None if missing)
+            ground_truth_intervals: [min, max] acceptable ranges (None if missing)
+            predicted_units: Predicted units (None if missing)
+            ground_truth_units: Ground truth units (None if missing)
+            
+        Returns:
+            (value_ok, unit_ok) boolean arrays, one entry per prediction
+        """
+        # Check values in one vectorized pass (None -> NaN, which never compares True)
+        values = np.array(predicted_values, dtype=float)
+        bounds = np.array([interval or (None, None) for interval in ground_truth_intervals],
+                          dtype=float).reshape(-1, 2)
+        value_ok = (values >= bounds[:, 0]) & (values <= bounds[:, 1])
+        
+        # Check units: normalize each list once (case/whitespace-insensitive),
+        # then compare pairwise. Missing units never match.
+        pred_units_norm = [u.lower().strip() if u is not None else None for u in predicted_units]
+        gt_units_norm = [u.lower().strip() if u is not None else None for u in ground_truth_units]
+        unit_ok = np.array([p is not None and p == g
+                            for p, g in zip(pred_units_norm, gt_units_norm)], dtype=bool)
+        
+        return value_ok, unit_ok
+    
     def evaluate(self, predictions_path: str) -> Dict:
         """
         Evaluate predictions from JSON file
@@ -52,46 +94,40 @@ class Method1Evaluator:
         """
         
         # Load predictions
-        with open(predictions_path, 'r') as f:
-            predictions = json.load(f)
+        predictions = load_json(predictions_path)
         
         total = len(predictions)
-        value_correct = 0
-        unit_correct = 0
-        both_correct = 0
-        
-        detailed_results = []
-        
-        for pred in predictions:
-            question_id = pred['question_id']
-            predicted_value = pred.get('predicted_value')
-            predicted_unit = pred.get('predicted_unit')
-            gt = pred.get('ground_truth', {})
-            gt_interval = gt.get('interval')
-            gt_unit = gt.get('unit')
-            
-            # Check value
-            value_ok = self.is_value_correct(predicted_value, gt_interval)
-            # Check unit
-            unit_ok = self.is_unit_correct(predicted_unit, gt_unit)
-            
-            if value_ok:
-                value_correct += 1
-            if unit_ok:
-                unit_correct += 1
-            if value_ok and unit_ok:
-                both_correct += 1
-            
-            detailed_results.append({
+        
+        question_ids = [pred['question_id'] for pred in predictions]
+        predicted_values = [pred.get('predicted_value') for pred in predictions]
+        predicted_units = [pred.get('predicted_unit') for pred in predictions]
+        ground_truths = [pred.get('ground_truth') or _EMPTY_GROUND_TRUTH for pred in predictions]
+        gt_intervals = [gt.get('interval') for gt in ground_truths]
+        gt_units = [gt.get('unit') for gt in ground_truths]
+        
+        value_ok, unit_ok = self.evaluate_batch(predicted_values, gt_intervals,
+                                                predicted_units, gt_units)
+        
+        both_ok = value_ok & unit_ok
+        value_correct = int(value_ok.sum())
+        unit_correct = int(unit_ok.sum())
+        both_correct = int(both_ok.sum())
+        
+        detailed_results = [
+            {
                 "question_id": question_id,
-                "value_correct": value_ok,
-                "unit_correct": unit_ok,
-                "both_correct": value_ok and unit_ok,
+                "value_correct": v_ok,
+                "unit_correct": u_ok,
+                "both_correct": b_ok,
                 "predicted_value": predicted_value,
                 "predicted_unit": predicted_unit,
                 "ground_truth_interval": gt_interval,
                 "ground_truth_unit": gt_unit
-            })
+            }
+            for question_id, v_ok, u_ok, b_ok, predicted_value, predicted_unit, gt_interval, gt_unit
+            in zip(question_ids, value_ok.tolist(), unit_ok.tolist(), both_ok.tolist(),
+                   predicted_values, predicted_units, gt_intervals, gt_units)
+        ]
         
         metrics = {
             "total_samples": total,
@@ -132,8 +168,7 @@ def main():
             "metrics": metrics,
             "detailed_results": detailed
         }
-        with open(args.output, 'w') as f:
-            json.dump(output_data, f, indent=2)
+        dump_json(output_data, args.output)
         print(f"\n✅ Detailed results saved to: {args.output}")
 
 
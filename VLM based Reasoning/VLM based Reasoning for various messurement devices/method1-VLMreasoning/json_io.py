@@ -0,0 +1,148 @@
+"""
+JSON file helpers for datasets and predictions
+
+Uses orjson when it is installed and falls back to the standard library.
+"""
+
+import json
+import mmap
+import os
+import re
+from pathlib import Path
+from typing import Any, List
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Large read buffer so multi-megabyte prediction files take fewer read syscalls
+READ_BUFFER_SIZE = 1 << 16
+# How much of a JSON array file's end is read to find its closing bracket
+_TAIL_SIZE = 4096
+
+
+def load_json(path: str) -> Any:
+    """Read and parse a JSON file"""
+    if orjson is not None:
+        with open(path, 'rb', buffering=READ_BUFFER_SIZE) as f:
+            return orjson.loads(f.read())
+    with open(path, 'r', buffering=READ_BUFFER_SIZE) as f:
+        return json.load(f)
+
+
+def dump_json(data: Any, path: str) -> None:
+    """
+    Write data to a JSON file with 2-space indentation
+
+    The whole document is encoded up front and written in one call to a
+    temporary file that is then renamed over path, so a crash mid-write
+    never leaves a truncated file behind.
+    """
+    if orjson is not None:
+        payload = orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    else:
+        # json.dump would stream many small chunks through the file object
+        payload = json.dumps(data, indent=2).encode('utf-8')
+    tmp_path = f"{path}.tmp"
+    Path(tmp_path).write_bytes(payload)
+    os.replace(tmp_path, path)
+
+
+def append_json_record(record: Any, path: str) -> None:
+    """
+    Append one record to a JSON array file written by dump_json
+
+    The record is spliced in before the closing bracket instead of
+    re-serializing the whole array, so the cost does not grow with the
+    file. Unlike dump_json this writes in place; the write is small,
+    but an interrupted append is not rolled back.
+    """
+    if orjson is not None:
+        item = orjson.dumps(record, option=orjson.OPT_INDENT_2)
+    else:
+        item = json.dumps(record, indent=2).encode('utf-8')
+    # Nest the record one level deeper, as dump_json lays out array items
+    item = b'\n'.join(b'  ' + line for line in item.split(b'\n'))
+    
+    with open(path, 'r+b') as f:
+        size = f.seek(0, os.SEEK_END)
+        start = f.seek(max(0, size - _TAIL_SIZE))
+        tail = f.read().rstrip()
+        if not tail.endswith(b']'):
+            raise ValueError(f"{path} does not end with a JSON array")
+        
+        body = tail[:-1].rstrip()
+        separator = b'\n' if body.endswith(b'[') else b',\n'
+        f.seek(start + len(body))
+        f.write(separator + item + b'\n]')
+        f.truncate()
+
+
+def may_contain_field(path: str, key: str, value: str) -> bool:
+    """
+    Byte-level check for a "key": "value" pair in a JSON file
+
+    Scans the memory-mapped file without parsing it. False means the pair
+    is definitely absent; True may be a false positive (e.g. the text
+    appears inside another string), so parse the file to be sure.
+
+    Non-ASCII text is matched both as raw UTF-8 (orjson output) and as
+    \\uXXXX escapes (json module output).
+    """
+    encodings = {json.dumps(value, ensure_ascii=ascii_only).encode('utf-8')
+                 for ascii_only in (True, False)}
+    pattern = re.compile(re.escape(json.dumps(key).encode('utf-8')) + rb'\s*:\s*'
+                         + rb'(?:' + rb'|'.join(re.escape(e) for e in encodings) + rb')')
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return False
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return pattern.search(data) is not None
+
+
+def to_jsonl_line(record: Any) -> bytes:
+    """Serialize one record as a JSON Lines line"""
+    if orjson is not None:
+        return orjson.dumps(record) + b'\n'
+    return json.dumps(record).encode('utf-8') + b'\n'
+
+
+def trim_partial_line(path: str) -> None:
+    """
+    Cut a JSON Lines file back to its last complete line
+
+    An interrupted run can leave a torn last line; appending after it
+    would glue the next record onto the fragment and lose both.
+    """
+    with open(path, 'r+b') as f:
+        end = f.seek(0, os.SEEK_END)
+        keep = 0
+        pos = end
+        while pos > 0:
+            start = max(0, pos - READ_BUFFER_SIZE)
+            f.seek(start)
+            newline = f.read(pos - start).rfind(b'\n')
+            if newline != -1:
+                keep = start + newline + 1
+                break
+            pos = start
+        if keep != end:
+            f.truncate(keep)
+
+
+def load_jsonl(path: str) -> List[Any]:
+    """Read a JSON Lines file, skipping blank or truncated lines"""
+    loads = orjson.loads if orjson is not None else json.loads
+    records = []
+    with open(path, 'rb', buffering=READ_BUFFER_SIZE) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(loads(line))
+            except ValueError:
+                # Partial last line left by an interrupted run
+                continue
+    return records
\ No newline at end of file
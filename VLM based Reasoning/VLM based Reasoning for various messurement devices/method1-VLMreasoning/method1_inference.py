@@ -4,47 +4,35 @@ Method 1: Simple VLM ROI-Based Gauge Reading
 Zero-shot visual reasoning using Vision-Language Models
 """
 
-import json
+import functools
 import os
-from typing import Dict, List
-from PIL import Image
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
 from tqdm import tqdm
 from pathlib import Path
 
 from vlm_client import VLMClient
 from answer_parser import AnswerParser
+from json_io import load_json, dump_json, load_jsonl, to_jsonl_line, trim_partial_line
+
+
+@functools.lru_cache(maxsize=256)
+def _build_prompt(template: str, question: str, instrument_type: Optional[str]) -> str:
+    """Fill in the prompt template (memoized: datasets repeat the same few questions)"""
+    prompt = template.format(question=question)
+    
+    if instrument_type:
+        return f"**Instrument Type:** {instrument_type}\n\n{prompt}"
+    
+    return prompt
 
 
 class Method1SimpleVLM:
     """Simple VLM-based gauge reading (Method 1)"""
     
-    def __init__(self, model_name: str = "gpt-4o"):
-        """
-        Initialize Method 1
-        
-        Args:
-            model_name: VLM model to use (gpt-4o, gpt-5, gemini-2.5-pro, qwen2-vl-7b, llama-3.2-11b-vision)
-        """
-        self.model_name = model_name
-        colab_url = os.getenv('COLAB_QWEN_URL')  # Get from environment
-        self.vlm_client = VLMClient(model_name=model_name, colab_url=colab_url)
-        self.answer_parser = AnswerParser()
-        
-        print(f"🚀 Method 1 initialized with {model_name}")
-        
-    def create_prompt(self, question: str, instrument_type: str = None) -> str:
-        """
-        Create structured prompt for gauge reading
-        
-        Args:
-            question: The question (e.g., "What is the reading of the ammeter?")
-            instrument_type: Optional instrument type hint (e.g., "ammeter")
-            
-        Returns:
-            Formatted prompt string
-        """
-        
-        prompt = f"""You are an expert at reading measuring instruments with high precision.
+    # Static prompt body, only the question is filled in per call
+    _PROMPT_TEMPLATE = """You are an expert at reading measuring instruments with high precision.
 
 **Question:** {question}
 
@@ -79,24 +67,45 @@ Example: Answer: 4.4 A
 Example: Answer: 66 ml
 Example: Answer: 285 psi
 """
-
-        if instrument_type:
-            prompt = f"**Instrument Type:** {instrument_type}\n\n" + prompt
+    
+    def __init__(self, model_name: str = "gpt-4o", cache_dir: Optional[str] = ".vlm_cache"):
+        """
+        Initialize Method 1
+        
+        Args:
+            model_name: VLM model to use (gpt-4o, gpt-5, gemini-2.5-pro, qwen2-vl-7b, llama-3.2-11b-vision)
+            cache_dir: Directory of the on-disk VLM response cache (None disables caching)
+        """
+        self.model_name = model_name
+        colab_url = os.getenv('COLAB_QWEN_URL')  # Get from environment
+        self.vlm_client = VLMClient(model_name=model_name, colab_url=colab_url, cache_dir=cache_dir)
+        self.answer_parser = AnswerParser()
+        
+        print(f"🚀 Method 1 initialized with {model_name}")
+        
+    def create_prompt(self, question: str, instrument_type: str = None) -> str:
+        """
+        Create structured prompt for gauge reading
+        
+        Args:
+            question: The question (e.g., "What is the reading of the ammeter?")
+            instrument_type: Optional instrument type hint (e.g., "ammeter")
             
-        return prompt
+        Returns:
+            Formatted prompt string
+        """
+        
+        return _build_prompt(self._PROMPT_TEMPLATE, question, instrument_type)
     
     def process_single(self, image_path: str, question: str, 
                       instrument_type: str = None) -> Dict:
         """Process a single image"""
         try:
-            # Load image
-            image = Image.open(image_path)
-            
             # Create prompt
             prompt = self.create_prompt(question, instrument_type)
             
-            # Query VLM
-            vlm_response = self.vlm_client.query(image, prompt)
+            # Query VLM (the client decodes the image and caches responses)
+            vlm_response = self.vlm_client.query(image_path, prompt)
             
             # ADDED: Print the actual response or error
             if vlm_response is None:
@@ -127,13 +136,38 @@ Example: Answer: 285 psi
             traceback.print_exc()
             return None
     
-    def evaluate_dataset(self, dataset_json_path: str, output_dir: str = "results") -> List[Dict]:
+    def _process_with_retry(self, item: Dict, max_retries: int = 3) -> Dict:
+        """Process a dataset item, retrying failed VLM calls with exponential backoff"""
+        result = None
+        for attempt in range(max_retries + 1):
+            result = self.process_single(item['image_path'], item['question'], item.get('image_type'))
+            # Only a VLM call that returned nothing is worth retrying. None means
+            # process_single raised locally (e.g. while parsing a cached response),
+            # which would fail the same way on every attempt.
+            if result is None or result.get("prediction") is not None:
+                return result
+            if attempt < max_retries:
+                time.sleep(2 ** attempt)
+        return result
+    
+    def evaluate_dataset(self, dataset_json_path: str, output_dir: str = "results",
+                         max_workers: int = 8, limit: Optional[int] = None) -> List[Dict]:
         """
         Run Method 1 on entire dataset
         
+        VLM calls are network-bound, so samples are processed concurrently by
+        a thread pool. Keep max_workers within the provider's rate limit.
+        
+        Each finished sample is appended to <model>_predictions.jsonl right
+        away, so an interrupted run resumes from there. Once all samples are
+        done they are written to <model>_predictions.json and the .jsonl log
+        is removed.
+        
         Args:
             dataset_json_path: Path to dataset JSON file
             output_dir: Where to save results (default: results/)
+            max_workers: Number of concurrent VLM requests (default: 8)
+            limit: Only process the first N samples (for testing)
             
         Returns:
             List of result dictionaries
@@ -143,43 +177,78 @@ Example: Answer: 285 psi
         
         # Load dataset
         print(f"📂 Loading dataset from: {dataset_json_path}")
-        with open(dataset_json_path, 'r') as f:
-            dataset = json.load(f)
+        dataset = load_json(dataset_json_path)
+        
+        if limit:
+            dataset = dataset[:limit]
+            print(f"⚠️  Limited to {limit} samples")
         
         print(f"📊 Dataset size: {len(dataset)} samples")
         
-        results = []
+        output_filename = f"{self.model_name.replace('/', '_')}_predictions.json"
+        output_path = os.path.join(output_dir, output_filename)
+        jsonl_path = os.path.splitext(output_path)[0] + ".jsonl"
         
-        print(f"\n🔄 Processing samples with {self.model_name}...\n")
+        # Resume from samples finished by an interrupted run
+        done = {}
+        if os.path.exists(jsonl_path):
+            done = {r['question_id']: r for r in load_jsonl(jsonl_path)}
+            # New records must not be appended onto a torn last line
+            trim_partial_line(jsonl_path)
+            print(f"♻️  Resuming: {len(done)} samples already in {jsonl_path}")
         
-        for item in tqdm(dataset, desc="Processing"):
-            question_id = item['question_id']
-            question = item['question']
-            image_path = item['image_path']
-            instrument_type = item.get('image_type')
-            ground_truth = item.get('ground_truth')
-            
-            # Process
-            result = self.process_single(image_path, question, instrument_type)
-            
-            # Format for evaluation
-            results.append({
-                "question_id": question_id,
-                "question": question,
-                "image_type": instrument_type,
-                "prediction": result["prediction"],
-                "predicted_value": result["predicted_value"],
-                "predicted_unit": result["predicted_unit"],
-                "ground_truth": ground_truth,
-                "vlm_response": result["vlm_response"]
-            })
+        # Results keep dataset order even though samples finish out of order
+        results = [done.get(item['question_id']) for item in dataset]
+        failed = []
         
-        # Save results
-        output_filename = f"{self.model_name.replace('/', '_')}_predictions.json"
-        output_path = os.path.join(output_dir, output_filename)
+        print(f"\n🔄 Processing samples with {self.model_name} ({max_workers} workers)...\n")
+        
+        # Managed by hand rather than with a `with` block: on Ctrl-C or an
+        # error, queued samples are cancelled instead of all being queried
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            with open(jsonl_path, 'ab', buffering=1 << 16) as log:
+                futures = {
+                    executor.submit(self._process_with_retry, item): idx
+                    for idx, item in enumerate(dataset)
+                    if results[idx] is None
+                }
+                
+                for future in tqdm(as_completed(futures), total=len(futures), desc="Processing"):
+                    idx = futures[future]
+                    item = dataset[idx]
+                    result = future.result() or {}
+                    
+                    if result.get("prediction") is None:
+                        failed.append(item['question_id'])
+                    
+                    # Format for evaluation
+                    results[idx] = {
+                        "question_id": item['question_id'],
+                        "question": item['question'],
+                        "image_type": item.get('image_type'),
+                        "prediction": result.get("prediction"),
+                        "predicted_value": result.get("predicted_value"),
+                        "predicted_unit": result.get("predicted_unit"),
+                        "ground_truth": item.get('ground_truth'),
+                        "vlm_response": result.get("prediction")
+                    }
+                    
+                    # Failed samples stay out of the log so a resumed run retries them
+                    if result.get("prediction") is not None:
+                        log.write(to_jsonl_line(results[idx]))
+                        log.flush()
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        executor.shutdown()
         
-        with open(output_path, 'w') as f:
-            json.dump(results, f, indent=2)
+        if failed:
+            print(f"\n⚠️  {len(failed)} samples failed after retries: {', '.join(failed)}")
+        
+        # Save results
+        dump_json(results, output_path)
+        os.remove(jsonl_path)
         
         print(f"\n✅ Results saved to: {output_path}")
         print(f"📊 Total samples processed: {len(results)}")
@@ -1,17 +1,13 @@
-import json
 import time
-import subprocess
 import os
-import sys
-from pathlib import Path
-from dotenv import load_dotenv
 
-# Load the .env file FIRST
-env_path = Path(__file__).resolve().parent.parent / '.env'
-load_dotenv(dotenv_path=env_path)
+# Load the .env file FIRST (vlm_client reads it once per process)
+from vlm_client import load_env
+load_env()
 
-# Force UTF-8 just in case
-os.environ["PYTHONIOENCODING"] = "utf-8"
+from method1_inference import Method1SimpleVLM
+from evaluate_method1 import Method1Evaluator
+from json_io import load_json, dump_json
 
 def run_evaluation():
     # Configuration
@@ -22,6 +18,9 @@ def run_evaluation():
     # CHANGE FROM 10 TO 5 SECONDS
     DELAY_SECONDS = 2
     
+    # Write predictions to disk every N new images (and once at the end)
+    CHECKPOINT_EVERY = 10
+    
     # Verify API key
     api_key = os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY")
     if not api_key:
@@ -35,101 +34,104 @@ def run_evaluation():
         print(f"[ERROR] Dataset not found")
         return
 
-    with open(DATASET_PATH, 'r') as f:
-        dataset = json.load(f)
+    dataset = load_json(DATASET_PATH)
     
     print(f"[START] Evaluating {len(dataset)} images with {MODEL}")
     print(f"[CONFIG] Delay: {DELAY_SECONDS}s between requests")
     
     # Load existing predictions to know what's already done
     processed_ids = set()
+    all_preds = []
     
     if os.path.exists(OUTPUT_FILE):
         try:
-            with open(OUTPUT_FILE, 'r') as f:
-                existing_data = json.load(f)
-                processed_ids = {p['question_id'] for p in existing_data}
+            all_preds = load_json(OUTPUT_FILE)
+            # Null predictions saved by older runs are retried (and replaced in place)
+            processed_ids = {p['question_id'] for p in all_preds if p.get('prediction') is not None}
             print(f"[INFO] Resuming... {len(processed_ids)} already done")
         except:
             print("[WARNING] Starting fresh")
+    
+    # question_id -> position in all_preds
+    pred_index = {p['question_id']: idx for idx, p in enumerate(all_preds)}
+    unsaved = 0
+    
+    os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
+    
+    # Initialize the model once and reuse it for every image
+    evaluator = Method1SimpleVLM(model_name=MODEL)
 
     # Process each image
-    for i, item in enumerate(dataset):
-        image_id = item['question_id']
-        
-        # Skip if already done
-        if image_id in processed_ids:
-            continue
+    try:
+        for i, item in enumerate(dataset):
+            image_id = item['question_id']
             
-        print(f"\n{'='*70}")
-        print(f"[{i+1}/{len(dataset)}] Processing {image_id}...")
-        print('='*70)
-        
-        # Run prediction - run_single_image.py handles all saving
-        cmd = f"python run_single_image.py --image_id {image_id} --model {MODEL}"
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True, env=os.environ.copy())
-        
-        if result.returncode != 0:
-            print(f"[FAILURE] Error on {image_id}")
-            print(result.stderr[:500])
-            print("[STOP] Stopping due to error")
-            sys.exit(1)
-        
-        # Now read the result that run_single_image.py just saved
-        try:
-            # Reload the predictions file to get the latest entry
-            with open(OUTPUT_FILE, 'r') as f:
-                all_preds = json.load(f)
+            # Skip if already done
+            if image_id in processed_ids:
+                continue
             
-            # Find the prediction for this image
-            prediction = None
-            for p in all_preds:
-                if p['question_id'] == image_id:
-                    prediction = p
-                    break
+            print(f"\n{'='*70}")
+            print(f"[{i+1}/{len(dataset)}] Processing {image_id}...")
+            print('='*70)
             
-            if prediction:
-                pred_value = prediction.get('predicted_value')
-                pred_unit = prediction.get('predicted_unit', '')
-                gt = prediction.get('ground_truth', {})
-                gt_interval = gt.get('interval', [None, None])
-                gt_unit = gt.get('unit', '')
-                
-                # Display result
-                print(f"[RESULT] Predicted: {pred_value} {pred_unit}")
-                print(f"[RESULT] Ground Truth: [{gt_interval[0]}, {gt_interval[1]}] {gt_unit}")
-                
-                if pred_value is not None and gt_interval[0] is not None:
-                    value_ok = gt_interval[0] <= pred_value <= gt_interval[1]
-                    unit_ok = (pred_unit and gt_unit and pred_unit.lower() == gt_unit.lower())
-                    status = "[CORRECT]" if (value_ok and unit_ok) else "[WRONG]"
-                    print(f"[RESULT] Status: {status}")
+            # Run prediction in-process
+            prediction = evaluator.process_single(item['image_path'], item['question'],
+                                                  item.get('image_type', 'Unknown'))
+            
+            # A swallowed API error comes back as a dict with prediction None;
+            # keep it out of all_preds so the next run retries the image
+            if prediction and 'question_id' in prediction and prediction.get('prediction') is not None:
+                prediction['ground_truth'] = item.get('ground_truth', {'interval': [None, None], 'unit': None})
+                if image_id in pred_index:
+                    all_preds[pred_index[image_id]] = prediction
                 else:
-                    print(f"[RESULT] Status: [NO PREDICTION]")
+                    pred_index[image_id] = len(all_preds)
+                    all_preds.append(prediction)
+                processed_ids.add(image_id)
+                
+                unsaved += 1
+                if unsaved >= CHECKPOINT_EVERY:
+                    dump_json(all_preds, OUTPUT_FILE)
+                    unsaved = 0
                 
-                print(f"[SAVED] Total in file: {len(all_preds)}")
+                # Display result
+                try:
+                    pred_value = prediction.get('predicted_value')
+                    pred_unit = prediction.get('predicted_unit', '')
+                    gt = prediction.get('ground_truth', {})
+                    gt_interval = gt.get('interval', [None, None])
+                    gt_unit = gt.get('unit', '')
+                    
+                    print(f"[RESULT] Predicted: {pred_value} {pred_unit}")
+                    print(f"[RESULT] Ground Truth: [{gt_interval[0]}, {gt_interval[1]}] {gt_unit}")
+                    
+                    if pred_value is not None and gt_interval[0] is not None:
+                        value_ok = Method1Evaluator.is_value_correct(pred_value, gt_interval)
+                        unit_ok = Method1Evaluator.is_unit_correct(pred_unit, gt_unit)
+                        status = "[CORRECT]" if (value_ok and unit_ok) else "[WRONG]"
+                        print(f"[RESULT] Status: {status}")
+                    else:
+                        print(f"[RESULT] Status: [NO PREDICTION]")
+                    
+                    print(f"[SAVED] Total predictions: {len(all_preds)}")
+                except Exception as e:
+                    print(f"[WARNING] Could not display result: {e}")
             else:
-                print(f"[WARNING] Prediction not found in file")
+                print(f"[WARNING] Failed to process {image_id}, it will be retried on the next run")
             
             print(f"[SUCCESS] {image_id} completed")
             
-        except Exception as e:
-            print(f"[WARNING] Could not read result: {e}")
-            print(f"[SUCCESS] {image_id} completed")
-        
-        print(f"[WAIT] Sleeping {DELAY_SECONDS}s...")
-        print('='*70)
-        time.sleep(DELAY_SECONDS)
+            print(f"[WAIT] Sleeping {DELAY_SECONDS}s...")
+            print('='*70)
+            time.sleep(DELAY_SECONDS)
+    finally:
+        if unsaved:
+            dump_json(all_preds, OUTPUT_FILE)
 
     print("\n" + "="*80)
     
-    # Final count
-    try:
-        with open(OUTPUT_FILE, 'r') as f:
-            final_data = json.load(f)
-        print(f"[DONE] Complete! Total predictions: {len(final_data)}")
-    except:
-        print(f"[DONE] Complete!")
+    # Final count (everything in memory has been flushed to OUTPUT_FILE)
+    print(f"[DONE] Complete! Total predictions: {len(all_preds)}")
     
     print("="*80)
 
@@ -49,6 +49,19 @@ def main():
         help="Limit number of samples to process (for testing)"
     )
     
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=8,
+        help="Number of concurrent VLM requests (default: 8)"
+    )
+    
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always query the VLM instead of reusing cached responses"
+    )
+    
     args = parser.parse_args()
     
     # Validate dataset path
@@ -66,31 +79,16 @@ def main():
     print("="*60)
     
     # Initialize Method 1
-    method1 = Method1SimpleVLM(model_name=args.model)
-    
-    # If limit is set, modify the dataset temporarily
-    if args.limit:
-        import json
-        with open(args.dataset, 'r') as f:
-            full_dataset = json.load(f)
-        
-        limited_dataset = full_dataset[:args.limit]
-        
-        # Save temporary limited dataset
-        temp_path = args.dataset.replace('.json', f'_limit{args.limit}.json')
-        with open(temp_path, 'w') as f:
-            json.dump(limited_dataset, f, indent=2)
-        
-        print(f"\n⚠️  Limited to {args.limit} samples (saved to {temp_path})")
-        dataset_path = temp_path
-    else:
-        dataset_path = args.dataset
+    method1 = Method1SimpleVLM(model_name=args.model,
+                               cache_dir=None if args.no_cache else ".vlm_cache")
     
     # Run evaluation
     try:
         results = method1.evaluate_dataset(
-            dataset_json_path=dataset_path,
-            output_dir=args.output_dir
+            dataset_json_path=args.dataset,
+            output_dir=args.output_dir,
+            max_workers=args.workers,
+            limit=args.limit
         )
         
         print(f"\n✅ Method 1 completed successfully!")
@@ -5,16 +5,15 @@ Usage:
     python run_single_image.py --image_name <filename> --model <model_name>
 """
 
-import json
 import argparse
 import os
 from pathlib import Path
 from method1_inference import Method1SimpleVLM
+from json_io import load_json, dump_json, append_json_record, may_contain_field
 
 def find_image_in_dataset(dataset_path, image_id=None, image_name=None):
     """Find specific image in dataset and return the full item"""
-    with open(dataset_path, 'r') as f:
-        dataset = json.load(f)
+    dataset = load_json(dataset_path)
     
     if image_id:
         # Search by question_id
@@ -49,6 +48,8 @@ def main():
                        help='Output directory for results')
     parser.add_argument('--colab_url', type=str,
                        help='Colab ngrok URL for Qwen (e.g., https://abc123.ngrok-free.app)')
+    parser.add_argument('--no_cache', action='store_true',
+                       help='Always query the VLM instead of reusing a cached response')
     
     args = parser.parse_args()
     
@@ -98,7 +99,8 @@ def main():
             return
         os.environ['COLAB_QWEN_URL'] = args.colab_url
     
-    evaluator = Method1SimpleVLM(model_name=args.model)
+    evaluator = Method1SimpleVLM(model_name=args.model,
+                                 cache_dir=None if args.no_cache else '.vlm_cache')
     
     # Process single image directly using process_single method
     print(f"Processing image using Method 1...")
@@ -137,7 +139,8 @@ def main():
     print(f"\n--- PREDICTION ---")
     vlm_answer = result.get('prediction', 'No answer')
     if vlm_answer:
-        print(f"VLM Answer: {str(vlm_answer)[:200]}{'...' if len(str(vlm_answer)) > 200 else ''}")
+        answer_text = str(vlm_answer)
+        print(f"VLM Answer: {answer_text[:200]}{'...' if len(answer_text) > 200 else ''}")
     else:
         print(f"VLM Answer: No answer")
     
@@ -208,36 +211,38 @@ def main():
     
     # Save individual result
     output_file = output_dir / f"single_{args.model}_{result['question_id']}.json"
-    with open(output_file, 'w') as f:
-        json.dump(result, f, indent=2)
+    dump_json(result, output_file)
     print(f"Individual result saved to: {output_file}")
     
     # Update or append to main predictions file
     predictions_file = output_dir / f"{args.model}_predictions.json"
-    if predictions_file.exists():
-        with open(predictions_file, 'r') as f:
-            all_predictions = json.load(f)
+    if predictions_file.exists() and not may_contain_field(predictions_file, 'question_id',
+                                                           result['question_id']):
+        # New image: append in place without parsing or rewriting the file
+        append_json_record(result, predictions_file)
+        print(f"Added new prediction to {predictions_file}")
+    elif predictions_file.exists():
+        all_predictions = load_json(predictions_file)
         
         # Check if this image already exists, update it
-        existing_idx = None
-        for idx, pred in enumerate(all_predictions):
-            if pred['question_id'] == result['question_id']:
-                existing_idx = idx
-                break
+        id_index = {pred['question_id']: idx for idx, pred in enumerate(all_predictions)}
+        existing_idx = id_index.get(result['question_id'])
         
-        if existing_idx is not None:
+        if existing_idx is not None and all_predictions[existing_idx] == result:
+            # Same result as the stored one (e.g. a cached VLM response)
+            print(f"Prediction unchanged in {predictions_file}, skipping write")
+        elif existing_idx is not None:
             all_predictions[existing_idx] = result
+            dump_json(all_predictions, predictions_file)
             print(f"Updated existing prediction in {predictions_file}")
         else:
-            all_predictions.append(result)
+            # New image: append in place instead of rewriting the file
+            append_json_record(result, predictions_file)
             print(f"Added new prediction to {predictions_file}")
     else:
-        all_predictions = [result]
+        dump_json([result], predictions_file)
         print(f"Created new predictions file: {predictions_file}")
     
-    with open(predictions_file, 'w') as f:
-        json.dump(all_predictions, f, indent=2)
-    
     print(f"\n{'='*70}")
     print(f"Done! You can now visualize this result in the notebook:")
     print(f"{'='*70}")
@@ -4,12 +4,16 @@ Supports:
 - API-based: GPT-4o, Gemini Models
 - Local: Qwen2-VL
 """
+import asyncio
+import binascii
+import functools
+import hashlib
 import os
 from pathlib import Path
+import diskcache
 from dotenv import load_dotenv
 import google.generativeai as genai
-from openai import OpenAI
-import base64
+from openai import AsyncOpenAI, OpenAI
 from io import BytesIO
 from PIL import Image
 
@@ -17,13 +21,103 @@ from PIL import Image
 # This finds the .env file even if you run the script from a different folder
 current_dir = Path(__file__).resolve().parent
 env_path = current_dir.parent / '.env'
-load_dotenv(dotenv_path=env_path)
+_env_loaded = False
+
+def load_env():
+    """Load the .env file into os.environ (only the first call reads it)"""
+    global _env_loaded
+    if not _env_loaded:
+        load_dotenv(dotenv_path=env_path)
+        _env_loaded = True
+
+load_env()
+
+# Longest image side sent to the VLM
+MAX_IMAGE_SIZE = 1024
+# JPEG quality of images re-encoded for upload
+JPEG_QUALITY = 85
+
+# SDK clients are built once per (model, API key) and shared by every
+# VLMClient, so creating a client per image does not re-run the setup
+_CLIENT_CACHE = {}
+
+# genai.configure() resets process-wide SDK state, so it only runs when the
+# API key actually changes
+_genai_api_key = None
+
+def _configure_genai(api_key):
+    """Point the Gemini SDK at api_key, skipping the call if it already is"""
+    global _genai_api_key
+    if api_key != _genai_api_key:
+        genai.configure(api_key=api_key)
+        _genai_api_key = api_key
+
+def _to_rgb(image):
+    """Convert a PIL image to RGB, flattening any transparency onto white"""
+    if image.mode == 'RGB':
+        return image
+    if image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info:
+        # A plain convert('RGB') drops alpha and exposes whatever colour sits
+        # under transparent pixels (usually black), which can hide dark
+        # needles and tick marks drawn on a transparent background
+        image = image.convert('RGBA')
+        background = Image.new('RGBA', image.size, (255, 255, 255, 255))
+        return Image.alpha_composite(background, image).convert('RGB')
+    return image.convert('RGB')
+
+# Decoded images and upload data URLs are memoized per (path, mtime): repeated
+# queries on one image skip the decode, and an edited file is picked up again.
+# Kept small since each decoded image holds up to a few MB.
+@functools.lru_cache(maxsize=32)
+def _load_image(image_path, mtime):
+    """Decode an image file to RGB, capped at MAX_IMAGE_SIZE on its longest side"""
+    # draft() lets the JPEG decoder downscale while decoding (no-op for
+    # other formats), thumbnail() caps what is sent to the VLM
+    with Image.open(image_path) as image:
+        image.draft('RGB', (MAX_IMAGE_SIZE, MAX_IMAGE_SIZE))
+        image.load()
+    # Palette/greyscale/RGBA PNGs are converted once here rather than by
+    # the SDK on every request (and palette images resize poorly)
+    image = _to_rgb(image)
+    image.thumbnail((MAX_IMAGE_SIZE, MAX_IMAGE_SIZE), Image.BILINEAR)
+    return image
+
+def _encode_jpeg(image):
+    """Encode a PIL image as JPEG bytes"""
+    image = _to_rgb(image)
+    buffer = BytesIO()
+    image.save(buffer, format='JPEG', quality=JPEG_QUALITY)
+    return buffer.getvalue()
+
+def _jpeg_data_url(data):
+    """Build a base64 data URL from JPEG bytes"""
+    # Assembled as bytes and decoded once, instead of base64 bytes -> str -> f-string
+    return (b"data:image/jpeg;base64," + binascii.b2a_base64(data, newline=False)).decode('ascii')
+
+@functools.lru_cache(maxsize=32)
+def _load_data_url(image_path, mtime):
+    """Encode an image file as a data URL of a JPEG of at most MAX_IMAGE_SIZE"""
+    # Raw PNGs are often several MB; a downscaled JPEG is a fraction of
+    # the upload and of the vision tokens. Small JPEGs are sent as they are.
+    with Image.open(image_path) as image:
+        send_as_is = image.format == 'JPEG' and max(image.size) <= MAX_IMAGE_SIZE
+    if send_as_is:
+        with open(image_path, "rb") as image_file:
+            data = image_file.read()
+    else:
+        data = _encode_jpeg(_load_image(image_path, mtime))
+    return _jpeg_data_url(data)
 
 class VLMClient:
-    def __init__(self, model_name='gemini-2.5-flash', colab_url=None):
+    def __init__(self, model_name='gemini-2.5-flash', colab_url=None, cache_dir=None):
         self.model_name = model_name
         self.colab_url = colab_url
         self.client = None
+        # AsyncOpenAI client for the async API and the event loop it belongs to
+        self._async_client = None
+        self._async_loop = None
+        # On-disk response cache (None disables caching)
+        self._cache = diskcache.Cache(cache_dir) if cache_dir else None
         self._setup_client()
 
     def _setup_client(self):
@@ -38,66 +132,177 @@ class VLMClient:
                 print(f"[ERROR] Current Directory: {os.getcwd()}")
                 raise ValueError("GEMINI_API_KEY or GOOGLE_API_KEY not found in environment variables")
             
-            genai.configure(api_key=api_key)
-            print(f"[OK] Initialized Google Gemini client with model: {self.model_name}")
-            self.client = genai.GenerativeModel(self.model_name)
+            _configure_genai(api_key)
+            key = (self.model_name, api_key)
+            if key not in _CLIENT_CACHE:
+                print(f"[OK] Initialized Google Gemini client with model: {self.model_name}")
+                _CLIENT_CACHE[key] = genai.GenerativeModel(self.model_name)
+            self.client = _CLIENT_CACHE[key]
         
         elif "gpt" in self.model_name:
             api_key = os.environ.get("OPENAI_API_KEY")
             if not api_key:
                 raise ValueError("OPENAI_API_KEY not found in environment variables")
             
-            self.client = OpenAI(api_key=api_key)
-            print(f"[OK] Initialized OpenAI client with model: {self.model_name}")
+            # One OpenAI client serves every GPT model
+            key = ("openai", api_key)
+            if key not in _CLIENT_CACHE:
+                _CLIENT_CACHE[key] = OpenAI(api_key=api_key)
+                print(f"[OK] Initialized OpenAI client with model: {self.model_name}")
+            self.client = _CLIENT_CACHE[key]
 
     def get_response(self, image_path, prompt):
-        """Get response from the VLM"""
+        """Get response from the VLM, reusing a cached one for the same image and prompt"""
+        cache_key = self._cache_key(image_path, prompt) if self._cache is not None else None
+        if cache_key:
+            response = self._cache.get(cache_key)
+            if response is not None:
+                return response
+        
+        if "gemini" in self.model_name:
+            response = self._query_gemini(image_path, prompt)
+        elif "gpt" in self.model_name:
+            response = self._query_gpt4(image_path, prompt)
+        else:
+            raise ValueError(f"Model {self.model_name} not supported yet")
+        
+        # Failed calls are not cached so they are retried next time
+        if cache_key and response is not None:
+            self._cache[cache_key] = response
+        return response
+    
+    async def aget_response(self, image_path, prompt):
+        """Async variant of get_response"""
+        # Hashing the image file and the disk cache lookups block, so they run
+        # in worker threads rather than serializing requests on the event loop
+        cache_key = None
+        if self._cache is not None:
+            cache_key = await asyncio.to_thread(self._cache_key, image_path, prompt)
+            response = await asyncio.to_thread(self._cache.get, cache_key)
+            if response is not None:
+                return response
+        
         if "gemini" in self.model_name:
-            return self._query_gemini(image_path, prompt)
+            response = await self._aquery_gemini(image_path, prompt)
         elif "gpt" in self.model_name:
-            return self._query_gpt4(image_path, prompt)
+            response = await self._aquery_gpt4(image_path, prompt)
         else:
             raise ValueError(f"Model {self.model_name} not supported yet")
+        
+        if cache_key and response is not None:
+            await asyncio.to_thread(self._cache.set, cache_key, response)
+        return response
+    
+    async def abatch(self, items, concurrency=8):
+        """
+        Query the VLM for many (image_path, prompt) pairs concurrently
+        
+        At most `concurrency` requests are in flight at once, so keep it
+        within the provider's rate limit. Responses come back in input order.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def bounded(image_path, prompt):
+            async with semaphore:
+                return await self.aget_response(image_path, prompt)
+        
+        try:
+            return await asyncio.gather(*(bounded(image_path, prompt) for image_path, prompt in items))
+        finally:
+            # Close the AsyncOpenAI client of this loop, its connections
+            # cannot be reused once the loop ends
+            if self._async_client is not None and self._async_loop is asyncio.get_running_loop():
+                await self._async_client.close()
+                self._async_client = self._async_loop = None
+    
+    def get_responses_batch(self, items, concurrency=8):
+        """Blocking wrapper around abatch for synchronous callers"""
+        return asyncio.run(self.abatch(items, concurrency))
+    
+    def _cache_key(self, image_path, prompt):
+        """Hash model, prompt and image content into a response cache key"""
+        key = hashlib.blake2b(digest_size=32)
+        key.update(self.model_name.encode('utf-8') + b'\0' + prompt.encode('utf-8') + b'\0')
+        if isinstance(image_path, Image.Image):
+            key.update(image_path.tobytes())
+        else:
+            with open(image_path, 'rb') as f:
+                key.update(f.read())
+        return key.hexdigest()
     
     def query(self, image_path, prompt):
         """Alias for get_response"""
         return self.get_response(image_path, prompt)
 
+    def _gemini_contents(self, image_path, prompt):
+        """Build the Gemini request contents"""
+        # FIXED: Ensure image_path is a string path, not a PIL Image
+        if isinstance(image_path, Image.Image):
+            img = image_path  # Already a PIL Image
+        else:
+            img = _load_image(str(image_path), os.path.getmtime(image_path))
+        return [prompt, img]
+
     def _query_gemini(self, image_path, prompt):
         """Query Google Gemini API"""
         try:
-            # FIXED: Ensure image_path is a string path, not a PIL Image
-            if isinstance(image_path, str):
-                img = Image.open(image_path)
-            else:
-                img = image_path  # Already a PIL Image
-            
-            response = self.client.generate_content([prompt, img])
+            response = self.client.generate_content(self._gemini_contents(image_path, prompt))
             return response.text
         except Exception as e:
             print(f"[ERROR] Gemini API Error: {e}")
             return None
 
+    async def _aquery_gemini(self, image_path, prompt):
+        """Query Google Gemini API without blocking the event loop"""
+        # The SDK's async gRPC client is a process-wide default that stays bound
+        # to the first event loop, so a second asyncio.run() could not use it.
+        # The sync client in a worker thread works from any loop and keeps the
+        # image decode off the loop as well.
+        return await asyncio.to_thread(self._query_gemini, image_path, prompt)
+
+    def _gpt4_request(self, image_path, prompt):
+        """Build the chat completion arguments for a GPT-4o query"""
+        # Encode image
+        if isinstance(image_path, Image.Image):
+            image_url = _jpeg_data_url(_encode_jpeg(image_path))
+        else:
+            image_url = _load_data_url(str(image_path), os.path.getmtime(image_path))
+
+        return dict(
+            model=self.model_name,
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": prompt},
+                        {"type": "image_url", "image_url": {"url": image_url}}
+                    ],
+                }
+            ],
+            max_tokens=300
+        )
+
     def _query_gpt4(self, image_path, prompt):
         """Query OpenAI GPT-4o API"""
         try:
-            # Encode image
-            with open(image_path, "rb") as image_file:
-                base64_image = base64.b64encode(image_file.read()).decode('utf-8')
-
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
-                        ],
-                    }
-                ],
-                max_tokens=300
-            )
+            response = self.client.chat.completions.create(**self._gpt4_request(image_path, prompt))
+            return response.choices[0].message.content
+        except Exception as e:
+            print(f"[ERROR] GPT-4 API Error: {e}")
+            return None
+
+    async def _aquery_gpt4(self, image_path, prompt):
+        """Query OpenAI GPT-4o API without blocking the event loop"""
+        try:
+            # Async HTTP connections are tied to one event loop, so every
+            # asyncio.run() (e.g. each get_responses_batch call) gets its own client
+            loop = asyncio.get_running_loop()
+            if self._async_loop is not loop:
+                self._async_client = AsyncOpenAI(api_key=self.client.api_key)
+                self._async_loop = loop
+            # Image decode and JPEG/base64 encoding run in a worker thread
+            request = await asyncio.to_thread(self._gpt4_request, image_path, prompt)
+            response = await self._async_client.chat.completions.create(**request)
             return response.choices[0].message.content
         except Exception as e:
             print(f"[ERROR] GPT-4 API Error: {e}")